@@ -1,18 +1,32 @@
 from __future__ import annotations
 
+import hashlib
+import heapq
+import json
 import os
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 from datetime import date, timedelta
 from decimal import Decimal, InvalidOperation
-from typing import Dict, List, Tuple
+from functools import lru_cache
+from itertools import zip_longest
+from operator import itemgetter
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Dict, List, Mapping, Optional, Tuple
 
-from flask import Flask, render_template, request
-from rdflib import Graph, Namespace
-from rdflib.namespace import RDF, RDFS
+from flask import Flask, abort, render_template, request
+
+if TYPE_CHECKING:
+    from rdflib import Graph, Namespace
 
 APP_DIR = os.path.dirname(os.path.abspath(__file__))
 ONTOLOGY_PATH = os.path.join(APP_DIR, "ontology.ttl")
+# Generated from ontology.ttl: rapper -i turtle -o ntriples ontology.ttl > ontology.nt,
+# then stamp_ontology_nt() records which ontology.ttl it was made from.
+ONTOLOGY_NT_PATH = os.path.join(APP_DIR, "ontology.nt")
+# Generated from ontology.ttl by write_ontology_json(); read without rdflib.
+ONTOLOGY_JSON_PATH = os.path.join(APP_DIR, "ontology.json")
 NS_URI = "http://example.org/ontologies/planirovanie-pereezda#"
+USE_RDFLIB = os.environ.get("USE_RDFLIB") == "1"
 
 MOVE_TYPES = {
     "DOMESTIC_RU": "Переезд по России",
@@ -30,9 +44,9 @@ class City:
 class Service:
     iri: str
     name: str
-    base_price: Decimal
-    per_item_price: Decimal
-    intl_coef: Decimal
+    base_price: int      # kopecks
+    per_item_price: int  # kopecks
+    intl_coef: int       # hundredths
     applicable_type: str
     condition: str
 
@@ -44,110 +58,235 @@ class Task:
     applicable_type: str
     condition: str
     base_days: int
-    per_item_days: Decimal
-    per_fragile_days: Decimal
+    per_item_days: int     # hundredths of a day
+    per_fragile_days: int  # hundredths of a day
     intl_extra_days: int
     depends_on: List[str]
 
+_ZERO = Decimal("0")
+_CENTS = Decimal("0.01")
+
 def _d(x) -> Decimal:
+    # rdflib Literals of xsd:decimal already carry a Decimal value.
+    v = x.toPython() if hasattr(x, "toPython") else x
+    if isinstance(v, Decimal):
+        return v
     try:
-        if x is None:
-            return Decimal("0")
-        return Decimal(str(x))
+        if v is None:
+            return _ZERO
+        return Decimal(str(v))
     except (InvalidOperation, TypeError):
-        return Decimal("0")
+        return _ZERO
+
+def _hundredths(x) -> int:
+    return int((_d(x) * 100).to_integral_value())
+
+def _div_round(num: int, den: int) -> int:
+    # Same banker's rounding as Decimal.quantize under the default context.
+    q, r = divmod(num, den)
+    if 2 * r > den or (2 * r == den and q % 2):
+        q += 1
+    return q
+
+def format_kopecks(v: int) -> str:
+    sign = "-" if v < 0 else ""
+    rub, kop = divmod(abs(v), 100)
+    return f"{sign}{rub}.{kop:02d}"
+
+NT_STAMP_PREFIX = "# source-sha256: "
+
+def _sha256_file(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def _nt_stamp(path: str) -> Optional[str]:
+    with open(path, encoding="utf-8") as f:
+        first = f.readline()
+    return first[len(NT_STAMP_PREFIX):].strip() if first.startswith(NT_STAMP_PREFIX) else None
+
+def _json_stamp(path: str) -> Optional[str]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f).get("source_sha256")
+
+# path -> ((mtime_ns, size), digest); a file is only re-read when it changes on disk
+_DIGESTS: Dict[str, Tuple[Tuple[int, int], Optional[str]]] = {}
+
+def _cached_digest(path: str, read) -> Optional[str]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    key = (st.st_mtime_ns, st.st_size)
+    hit = _DIGESTS.get(path)
+    if hit is None or hit[0] != key:
+        hit = (key, read(path))
+        _DIGESTS[path] = hit
+    return hit[1]
+
+def _is_fresh(path: str, read_stamp) -> bool:
+    # Generated files record the hash of the ontology.ttl they came from;
+    # mtimes are not reliable after a checkout or a copy.
+    stamp = _cached_digest(path, read_stamp)
+    return stamp is not None and stamp == _cached_digest(ONTOLOGY_PATH, _sha256_file)
+
+def rdf_source() -> Tuple[str, str]:
+    # The N-Triples parser is much faster than Turtle; use the generated copy
+    # unless it is missing or was generated from a different Turtle source.
+    if _is_fresh(ONTOLOGY_NT_PATH, _nt_stamp):
+        return ONTOLOGY_NT_PATH, "nt"
+    return ONTOLOGY_PATH, "turtle"
+
+def ontology_source() -> Tuple[str, str]:
+    if not USE_RDFLIB and _is_fresh(ONTOLOGY_JSON_PATH, _json_stamp):
+        return ONTOLOGY_JSON_PATH, "json"
+    return rdf_source()
 
 def load_graph() -> Tuple[Graph, Namespace]:
+    from rdflib import Graph, Namespace
+
+    path, fmt = rdf_source()
     g = Graph()
-    g.parse(ONTOLOGY_PATH, format="turtle")
+    g.parse(path, format=fmt)
     ns = Namespace(NS_URI)
     return g, ns
 
 def query_cities(g: Graph, NS: Namespace) -> Dict[str, City]:
-    q = f"""
-    SELECT ?city ?label ?code ?ccode WHERE {{
-      ?city a <{NS.Город}> ;
-            <{RDFS.label}> ?label ;
-            <{NS.кодГорода}> ?code ;
-            <{NS.странаКод}> ?ccode .
-    }}
-    """
+    from rdflib.namespace import RDF, RDFS
+
+    required = (RDFS.label, NS.кодГорода, NS.странаКод)
     out: Dict[str, City] = {}
-    for row in g.query(q):
-        iri = str(row.city)
-        out[iri] = City(iri=iri, label=str(row.label), code=str(row.code), country_code=str(row.ccode))
+    for s in g.subjects(RDF.type, NS.Город):
+        props = dict(g.predicate_objects(s))
+        if any(p not in props for p in required):
+            continue
+        iri = str(s)
+        out[iri] = City(
+            iri=iri,
+            label=str(props[RDFS.label]),
+            code=str(props[NS.кодГорода]),
+            country_code=str(props[NS.странаКод]),
+        )
     return out
 
 def query_services(g: Graph, NS: Namespace) -> Dict[str, Service]:
-    q = f"""
-    SELECT ?s ?name ?base ?per ?coef ?app ?cond WHERE {{
-      ?s a <{NS.Услуга}> ;
-         <{NS.названиеУслуги}> ?name ;
-         <{NS.базоваяЦена}> ?base ;
-         <{NS.ценаЗаПредмет}> ?per ;
-         <{NS.коэффициентДляМеждународного}> ?coef ;
-         <{NS.применимоКТипуУслуги}> ?app ;
-         <{NS.условиеУслуги}> ?cond .
-    }}
-    """
+    from rdflib.namespace import RDF
+
+    required = (
+        NS.названиеУслуги, NS.базоваяЦена, NS.ценаЗаПредмет,
+        NS.коэффициентДляМеждународного, NS.применимоКТипуУслуги, NS.условиеУслуги,
+    )
     out: Dict[str, Service] = {}
-    for row in g.query(q):
-        iri = str(row.s)
+    for s in g.subjects(RDF.type, NS.Услуга):
+        props = dict(g.predicate_objects(s))
+        if any(p not in props for p in required):
+            continue
+        iri = str(s)
         out[iri] = Service(
             iri=iri,
-            name=str(row.name),
-            base_price=_d(row.base),
-            per_item_price=_d(row.per),
-            intl_coef=_d(row.coef),
-            applicable_type=str(row.app),
-            condition=str(row.cond),
+            name=str(props[NS.названиеУслуги]),
+            base_price=_hundredths(props[NS.базоваяЦена]),
+            per_item_price=_hundredths(props[NS.ценаЗаПредмет]),
+            intl_coef=_hundredths(props[NS.коэффициентДляМеждународного]),
+            applicable_type=str(props[NS.применимоКТипуУслуги]),
+            condition=str(props[NS.условиеУслуги]),
         )
     return out
 
 def query_tasks(g: Graph, NS: Namespace) -> Dict[str, Task]:
-    q = f"""
-    SELECT ?t ?label ?desc ?app ?cond ?base ?pi ?pf ?intl WHERE {{
-      ?t a <{NS.Задача}> ;
-         <{RDFS.label}> ?label ;
-         <{NS.описаниеЗадачи}> ?desc ;
-         <{NS.применимоКТипу}> ?app ;
-         <{NS.условиеЗадачи}> ?cond ;
-         <{NS.днейБаза}> ?base ;
-         <{NS.днейНаПредмет}> ?pi ;
-         <{NS.днейНаХрупкий}> ?pf ;
-         <{NS.днейЕслиМеждународный}> ?intl .
-    }}
-    """
+    from rdflib.namespace import RDF, RDFS
+
+    required = (
+        RDFS.label, NS.описаниеЗадачи, NS.применимоКТипу, NS.условиеЗадачи,
+        NS.днейБаза, NS.днейНаПредмет, NS.днейНаХрупкий, NS.днейЕслиМеждународный,
+    )
     out: Dict[str, Task] = {}
-    for row in g.query(q):
-        iri = str(row.t)
+    for s in g.subjects(RDF.type, NS.Задача):
+        props = dict(g.predicate_objects(s))
+        if any(p not in props for p in required):
+            continue
+        iri = str(s)
         out[iri] = Task(
             iri=iri,
-            label=str(row.label),
-            description=str(row.desc),
-            applicable_type=str(row.app),
-            condition=str(row.cond),
-            base_days=int(str(row.base)),
-            per_item_days=_d(row.pi),
-            per_fragile_days=_d(row.pf),
-            intl_extra_days=int(str(row.intl)),
+            label=str(props[RDFS.label]),
+            description=str(props[NS.описаниеЗадачи]),
+            applicable_type=str(props[NS.применимоКТипу]),
+            condition=str(props[NS.условиеЗадачи]),
+            base_days=int(str(props[NS.днейБаза])),
+            per_item_days=_hundredths(props[NS.днейНаПредмет]),
+            per_fragile_days=_hundredths(props[NS.днейНаХрупкий]),
+            intl_extra_days=int(str(props[NS.днейЕслиМеждународный])),
             depends_on=[],
         )
 
-    q_dep = f"""
-    SELECT ?t ?dep WHERE {{
-      ?t a <{NS.Задача}> .
-      OPTIONAL {{ ?t <{NS.зависитОт}> ?dep . }}
-    }}
-    """
-    for row in g.query(q_dep):
-        t = str(row.t)
-        dep = str(row.dep) if row.dep is not None else None
-        if dep and t in out:
-            out[t].depends_on.append(dep)
+    for t, _, dep in g.triples((None, NS.зависитОт, None)):
+        t = str(t)
+        if t in out:
+            out[t].depends_on.append(str(dep))
 
     return out
 
+Ontology = Tuple[Dict[str, City], Dict[str, Service], Dict[str, Task]]
+
+def read_ontology_json(path: str) -> Ontology:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    cities = {c["iri"]: City(**c) for c in data["cities"]}
+    services = {s["iri"]: Service(**s) for s in data["services"]}
+    tasks = {t["iri"]: Task(**t) for t in data["tasks"]}
+    return cities, services, tasks
+
+def write_ontology_json(path: str = ONTOLOGY_JSON_PATH) -> None:
+    g, NS = load_graph()
+    data = {
+        "source_sha256": _sha256_file(ONTOLOGY_PATH),
+        "cities": [asdict(c) for c in query_cities(g, NS).values()],
+        "services": [asdict(s) for s in query_services(g, NS).values()],
+        "tasks": [asdict(t) for t in query_tasks(g, NS).values()],
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2, default=str)
+        f.write("\n")
+
+def stamp_ontology_nt(path: str = ONTOLOGY_NT_PATH) -> None:
+    # (Re)write the header line recording the hash of the current ontology.ttl.
+    with open(path, encoding="utf-8") as f:
+        lines = f.readlines()
+    if lines and lines[0].startswith(NT_STAMP_PREFIX):
+        lines = lines[1:]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"{NT_STAMP_PREFIX}{_sha256_file(ONTOLOGY_PATH)}\n")
+        f.writelines(lines)
+
+# (applicable_type, condition) -> [(load index, Service | Task), ...]
+Buckets = Dict[Tuple[str, str], List[tuple]]
+
+_ONTOLOGY_CACHE: Optional[Ontology] = None
+_ONTOLOGY_MTIME: Optional[Tuple[str, int]] = None
+_SERVICE_BUCKETS: Buckets = {}
+_TASK_BUCKETS: Buckets = {}
+_ORIGIN_CITY: Optional[City] = None
+_DEST_CITIES: List[City] = []
+
+def load_ontology() -> Ontology:
+    global _ONTOLOGY_CACHE, _ONTOLOGY_MTIME, _SERVICE_BUCKETS, _TASK_BUCKETS, _ORIGIN_CITY, _DEST_CITIES
+    path, fmt = ontology_source()
+    mtime = (path, os.stat(path).st_mtime_ns)
+    if _ONTOLOGY_CACHE is None or mtime != _ONTOLOGY_MTIME:
+        if fmt == "json":
+            _ONTOLOGY_CACHE = read_ontology_json(path)
+        else:
+            g, NS = load_graph()
+            _ONTOLOGY_CACHE = (query_cities(g, NS), query_services(g, NS), query_tasks(g, NS))
+        _ONTOLOGY_MTIME = mtime
+        _SERVICE_BUCKETS = bucket_by_rule(_ONTOLOGY_CACHE[1].values())
+        _TASK_BUCKETS = bucket_by_rule(_ONTOLOGY_CACHE[2].values())
+        cities = _ONTOLOGY_CACHE[0].values()
+        _ORIGIN_CITY = next((c for c in cities if c.code == "KRR" or c.label == "Краснодар"), None)
+        _DEST_CITIES = sorted((c for c in cities if c != _ORIGIN_CITY), key=lambda x: x.label)
+        for cached in (cached_services, cached_cost, cached_tasks):
+            cached.cache_clear()
+    return _ONTOLOGY_CACHE
+
 def detect_move_type(destination: City) -> str:
     return "INTERNATIONAL" if destination.country_code != "RU" else "DOMESTIC_RU"
 
@@ -156,54 +295,54 @@ def parse_items_from_form() -> Tuple[List[dict], int, bool]:
     frag_flags = request.form.getlist("item_fragile")
     items: List[dict] = []
     fragile_count = 0
-    for i, nm in enumerate(names):
+    for nm, frag in zip_longest(names, frag_flags, fillvalue=""):
         nm = (nm or "").strip()
         if not nm:
             continue
-        is_frag = (i < len(frag_flags) and frag_flags[i] == "on")
+        is_frag = frag == "on"
         if is_frag:
             fragile_count += 1
         items.append({"name": nm, "fragile": is_frag})
     return items, fragile_count, fragile_count > 0
 
-def select_services(services: Dict[str, Service], move_type: str) -> List[Service]:
-    picked: List[Service] = []
-    for s in services.values():
-        if s.applicable_type not in ("ANY", move_type):
-            continue
-        if s.condition == "ANY":
-            picked.append(s)
-        elif s.condition == "Международный" and move_type == "INTERNATIONAL":
-            picked.append(s)
-    return picked
-
-def estimate_cost(services: List[Service], n_items: int, move_type: str, employer_covers: bool) -> Tuple[Decimal, Decimal, Dict[str, Decimal]]:
-    total = Decimal("0")
-    breakdown: Dict[str, Decimal] = {}
+def bucket_by_rule(items) -> Buckets:
+    buckets: Buckets = {}
+    for i, it in enumerate(items):
+        buckets.setdefault((it.applicable_type, it.condition), []).append((i, it))
+    return buckets
+
+def _pick(buckets: Buckets, move_type: str, conditions: List[str]) -> list:
+    # Buckets keep load order, so merging by index reproduces a linear scan.
+    hits = [buckets.get((app_type, cond), []) for app_type in ("ANY", move_type) for cond in conditions]
+    return [it for _, it in heapq.merge(*hits, key=itemgetter(0))]
+
+def select_services(buckets: Buckets, move_type: str) -> List[Service]:
+    conditions = ["ANY"]
+    if move_type == "INTERNATIONAL":
+        conditions.append("Международный")
+    return _pick(buckets, move_type, conditions)
+
+def estimate_cost(services: List[Service], n_items: int, move_type: str, employer_covers: bool) -> Tuple[int, int, Dict[str, int]]:
+    total = 0
+    breakdown: Dict[str, int] = {}
     for s in services:
-        cost = s.base_price + (s.per_item_price * Decimal(n_items))
+        cost = s.base_price + s.per_item_price * n_items
         if move_type == "INTERNATIONAL":
-            cost = cost * s.intl_coef
-        cost = cost.quantize(Decimal("0.01"))
+            cost = _div_round(cost * s.intl_coef, 100)
         breakdown[s.name] = cost
         total += cost
-    out_of_pocket = total * (Decimal("0.30") if employer_covers else Decimal("1.00"))
-    return total.quantize(Decimal("0.01")), out_of_pocket.quantize(Decimal("0.01")), breakdown
+    out_of_pocket = _div_round(total * 30, 100) if employer_covers else total
+    return total, out_of_pocket, breakdown
 
-def select_tasks(tasks: Dict[str, Task], move_type: str, has_fragile: bool, has_work: bool, needs_permit: bool) -> List[Task]:
-    picked: List[Task] = []
-    for t in tasks.values():
-        if t.applicable_type not in ("ANY", move_type):
-            continue
-        if t.condition == "ANY":
-            picked.append(t)
-        elif t.condition == "ХрупкоеЕсть" and has_fragile:
-            picked.append(t)
-        elif t.condition == "Международный" and move_type == "INTERNATIONAL":
-            picked.append(t)
-        elif t.condition == "НужноРазрешение" and move_type == "INTERNATIONAL" and has_work and needs_permit:
-            picked.append(t)
-    return picked
+def select_tasks(buckets: Buckets, move_type: str, has_fragile: bool, has_work: bool, needs_permit: bool) -> List[Task]:
+    conditions = ["ANY"]
+    if has_fragile:
+        conditions.append("ХрупкоеЕсть")
+    if move_type == "INTERNATIONAL":
+        conditions.append("Международный")
+        if has_work and needs_permit:
+            conditions.append("НужноРазрешение")
+    return _pick(buckets, move_type, conditions)
 
 def topo_sort(tasks: List[Task]) -> List[Task]:
     by_iri = {t.iri: t for t in tasks}
@@ -214,32 +353,27 @@ def topo_sort(tasks: List[Task]) -> List[Task]:
             if dep in by_iri:
                 indeg[t.iri] += 1
                 adj[dep].append(t.iri)
-    queue = sorted([iri for iri, d in indeg.items() if d == 0])
+    queue = [iri for iri, d in indeg.items() if d == 0]
+    heapq.heapify(queue)
     ordered: List[Task] = []
+    processed = set()
     while queue:
-        iri = queue.pop(0)
+        iri = heapq.heappop(queue)
         ordered.append(by_iri[iri])
+        processed.add(iri)
         for nxt in adj[iri]:
             indeg[nxt] -= 1
             if indeg[nxt] == 0:
-                queue.append(nxt)
-                queue.sort()
+                heapq.heappush(queue, nxt)
     if len(ordered) != len(tasks):
-        remaining = [by_iri[i] for i in by_iri if i not in {t.iri for t in ordered}]
-        ordered.extend(remaining)
+        ordered.extend(t for i, t in by_iri.items() if i not in processed)
     return ordered
 
-def ceil_decimal(d: Decimal) -> int:
-    i = int(d)
-    return i if d == Decimal(i) else i + 1
-
 def task_duration_days(t: Task, n_items: int, fragile_count: int, move_type: str) -> int:
-    d = Decimal(t.base_days)
-    d += t.per_item_days * Decimal(n_items)
-    d += t.per_fragile_days * Decimal(fragile_count)
+    d = t.base_days * 100 + t.per_item_days * n_items + t.per_fragile_days * fragile_count
     if move_type == "INTERNATIONAL":
-        d += Decimal(t.intl_extra_days)
-    return max(1, ceil_decimal(d))
+        d += t.intl_extra_days * 100
+    return max(1, -(-d // 100))
 
 def build_schedule_cp(ordered_tasks: List[Task], start: date, n_items: int, fragile_count: int, move_type: str) -> Tuple[List[dict], date, int, int]:
     by_iri = {t.iri: t for t in ordered_tasks}
@@ -291,29 +425,56 @@ def build_schedule_cp(ordered_tasks: List[Task], start: date, n_items: int, frag
 
     return plan, move_date, project_days, buffer_days
 
+# Memoized on the discrete request inputs; cleared by load_ontology() on reload.
+@lru_cache(maxsize=8)
+def cached_services(move_type: str) -> Tuple[Service, ...]:
+    load_ontology()
+    return tuple(select_services(_SERVICE_BUCKETS, move_type))
+
+@lru_cache(maxsize=64)
+def cached_cost(move_type: str, n_items: int, employer_covers: bool) -> Tuple[int, int, Mapping[str, int]]:
+    total, out_of_pocket, breakdown = estimate_cost(list(cached_services(move_type)), n_items, move_type, employer_covers)
+    # the cached result is shared by every request, so hand out a read-only view
+    return total, out_of_pocket, MappingProxyType(breakdown)
+
+@lru_cache(maxsize=32)
+def cached_tasks(move_type: str, has_fragile: bool, has_work: bool, needs_permit: bool) -> Tuple[Task, ...]:
+    load_ontology()
+    return tuple(topo_sort(select_tasks(_TASK_BUCKETS, move_type, has_fragile, has_work, needs_permit)))
+
+# Load at import so a pre-forking server (gunicorn --preload, see
+# gunicorn.conf.py) parses once and shares the data with its workers.
+load_ontology()
+
 app = Flask(__name__)
+app.config["MAX_CONTENT_LENGTH"] = 64 * 1024
+app.add_template_filter(format_kopecks, "rub")
+# Compile templates up front so they are cached before workers fork.
+for _template in ("index.html", "result.html"):
+    app.jinja_env.get_template(_template)
+
+MAX_CONTENT_TYPE_PARAMS = 256
+
+@app.before_request
+def reject_oversized_content_type():
+    # Refuse pathological Content-Type headers before Werkzeug parses the form.
+    _, _, params = (request.content_type or "").partition(";")
+    if len(params) > MAX_CONTENT_TYPE_PARAMS:
+        abort(400)
 
 @app.get("/")
 def index():
-    g, NS = load_graph()
-    cities = query_cities(g, NS)
-    origin_city = next((c for c in cities.values() if c.code == "KRR" or c.label == "Краснодар"), None)
-    dest_cities = [c for c in cities.values() if c != origin_city]
-    dest_cities.sort(key=lambda x: x.label)
-    return render_template("index.html", origin_city=origin_city, dest_cities=dest_cities, move_types=MOVE_TYPES)
+    load_ontology()
+    return render_template("index.html", origin_city=_ORIGIN_CITY, dest_cities=_DEST_CITIES, move_types=MOVE_TYPES)
 
 @app.post("/recommend")
 def recommend():
-    g, NS = load_graph()
-
-    cities = query_cities(g, NS)
-    services = query_services(g, NS)
-    tasks = query_tasks(g, NS)
+    cities, _, _ = load_ontology()
 
     dest_iri = request.form.get("destination", "")
     destination = cities.get(dest_iri)
 
-    origin = next((c for c in cities.values() if c.code == "KRR" or c.label == "Краснодар"), None)
+    origin = _ORIGIN_CITY
 
     move_type_form = request.form.get("move_type", "DOMESTIC_RU")
     move_type_detected = detect_move_type(destination) if destination else move_type_form
@@ -321,9 +482,9 @@ def recommend():
 
     desired_budget_raw = request.form.get("desired_budget", "0")
     try:
-        desired_budget = Decimal(desired_budget_raw).quantize(Decimal("0.01"))
+        desired_budget = int(Decimal(desired_budget_raw).quantize(_CENTS) * 100)
     except Exception:
-        desired_budget = Decimal("0.00")
+        desired_budget = 0
 
     has_work = request.form.get("has_work") == "on"
     needs_permit = request.form.get("needs_permit") == "on"
@@ -337,15 +498,14 @@ def recommend():
         except Exception:
             n_items = 0
 
-    picked_services = select_services(services, move_type)
-    total_cost, out_of_pocket, breakdown = estimate_cost(picked_services, n_items, move_type, employer_covers)
+    picked_services = cached_services(move_type)
+    total_cost, out_of_pocket, breakdown = cached_cost(move_type, n_items, employer_covers)
 
-    reserve = Decimal("1.25") if move_type == "INTERNATIONAL" else Decimal("1.15")
-    recommended_budget = (out_of_pocket * reserve).quantize(Decimal("0.01"))
-    delta = (desired_budget - recommended_budget).quantize(Decimal("0.01"))
+    reserve = 125 if move_type == "INTERNATIONAL" else 115
+    recommended_budget = _div_round(out_of_pocket * reserve, 100)
+    delta = desired_budget - recommended_budget
 
-    picked_tasks = select_tasks(tasks, move_type, fragile_any, has_work, needs_permit)
-    ordered_tasks = topo_sort(picked_tasks)
+    ordered_tasks = list(cached_tasks(move_type, fragile_any, has_work, needs_permit))
     start_date = date.today()
     schedule, recommended_move_date, project_days, buffer_days = build_schedule_cp(
         ordered_tasks, start_date, n_items, fragile_count, move_type
@@ -0,0 +1,4 @@
+# gunicorn -c gunicorn.conf.py  (run from this directory)
+wsgi_app = "app:app"
+workers = 4
+preload_app = True
@@ -1,7 +1,8 @@
 import pygame
 import sys
-import math
-from collections import deque
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
 
 # -------------------- Constants (variant 30) --------------------
 ADC_BITS = 8
@@ -29,6 +30,14 @@ TH_55 = 55.0
 TH_70 = 70.0
 TH_95 = 95.0
 
+# Stress is stored as an integer number of 0.1 kgf/mm^2 steps
+STRESS_Q = 10
+TENSO_MAX_Q = int(TENSO_MAX * STRESS_Q)
+TH_55_Q = int(TH_55 * STRESS_Q)
+TH_70_Q = int(TH_70 * STRESS_Q)
+TH_95_Q = int(TH_95 * STRESS_Q)
+STRESS_RATE_Q = 250   # ↑/↓ change, steps per second (25 kgf/mm^2 per second)
+
 RAMP_UP_SEC = 12.0    # Fig B.8a
 RAMP_DOWN_SEC = 5.0   # Fig B.8b
 
@@ -39,6 +48,9 @@ MAX_LOG_LINES = 12
 # Full travel at 116V takes ~30 seconds
 TRAVEL_TIME_AT_NOM = 30.0
 BASE_SPEED = 1.0 / TRAVEL_TIME_AT_NOM
+# gate speed is proportional to u_out / U_NOM, capped at 120% of nominal
+_POS_SPEED_PER_VOLT = BASE_SPEED / U_NOM
+_POS_SPEED_CAP = 1.2 * BASE_SPEED
 
 OPEN1_POS = 0.80
 OPEN2_POS = 1.00
@@ -47,12 +59,57 @@ CLOSE2_POS = 0.00
 
 # UI
 W, H = 1600, 900
+BG_COLOR = (18, 18, 22)
+SIM_FPS = 120          # simulation steps per second
+RENDER_PERIOD_MS = 33  # redraw at most ~30 times per second
+GRAPH_SECONDS = 60.0   # time window of the voltage graph
+
+def _left_panel_rows():
+    # y of every left-panel row, top to bottom; the static layer and the
+    # per-frame redraw both place their rows from this one table
+    rows = {}
+    y = 80
+    rows["heading"] = y; y += 30
+    rows["ko"] = y; y += 24
+    rows["kz"] = y; y += 24
+    y += 6
+    rows["uz"] = y; y += 24
+    y += 6
+    rows["kv_o"] = y; y += 24
+    rows["kv_z"] = y; y += 24
+    y += 10
+    rows["stress"] = y; y += 24
+    rows["stress_bar"] = y + 10
+    rows["stress_hint"] = y + 32
+    y += 70
+    rows["port300"] = y; y += 26
+    rows["port300_bits"] = y; y += 40
+    rows["port301"] = y; y += 26
+    rows["port301_bits"] = y; y += 40
+    rows["dac"] = y; y += 24
+    rows["position"] = y + 20
+    rows["pos_bar"] = y + 50
+    return rows
+
+LEFT_ROWS = _left_panel_rows()
+# one sample per simulation step; room for the whole window plus a second of slack
+HISTORY_LEN = int(SIM_FPS * GRAPH_SECONDS) + SIM_FPS
 
 # Bit mapping for visualization (as in your scheme)
 # Port 300h (input):
 # bit15 GT, bit14 KZ, bit13 KO, bit12 US(OR), bit11 KV_Z2, bit10 KV_Z1, bit9 KV_O2, bit8 KV_O1, bits7..0 ADC
 # Port 301h (output):
 # bits7..0 DAC, bit14 ZP_DAC, bit15 ZP_ADC
+P300_KV_O1 = 1 << 8
+P300_KV_O2 = 1 << 9
+P300_KV_Z1 = 1 << 10
+P300_KV_Z2 = 1 << 11
+P300_US = 1 << 12
+P300_KO = 1 << 13
+P300_KZ = 1 << 14
+P300_GT = 1 << 15
+P301_ZP_DAC = 1 << 14
+P301_ZP_ADC = 1 << 15
 
 # -------------------- Helpers --------------------
 def clamp(x, a, b):
@@ -66,20 +123,44 @@ def adc_code_from_voltage(u):
     u = clamp(u, 0.0, ADC_VREF)
     return int(round(u / ADC_VREF * ADC_MAX))
 
+# DAC is 8-bit, so every output voltage can be tabulated up front.
+_DAC_V = tuple((c / DAC_MAX) * DAC_VMAX for c in range(DAC_MAX + 1))
+
 def dac_voltage_from_code(code):
-    return (code / DAC_MAX) * DAC_VMAX
+    return _DAC_V[code & 0xFF]
+
+# ADC code for every quantized stress value, through the same
+# tenso_to_voltage + adc_code_from_voltage path (round half to even)
+_ADC_Q = tuple(adc_code_from_voltage(tenso_to_voltage(q / STRESS_Q)) for q in range(TENSO_MAX_Q + 1))
+
+def adc_code_from_stress_q(stress_q):
+    return _ADC_Q[stress_q]
+
+# sensor voltage for every quantized stress value
+_TENSO_U_Q = tuple(tenso_to_voltage(q / STRESS_Q) for q in range(TENSO_MAX_Q + 1))
+
+def tenso_voltage_from_stress_q(stress_q):
+    return _TENSO_U_Q[stress_q]
 
 def fmt_bool(v):
     return "1" if v else "0"
 
+# "0xNN" for every 8-bit code shown in the UI
+_HEX8 = tuple(f"0x{i:02X}" for i in range(256))
+
 # -------------------- Ramp controller --------------------
 class Ramp:
+    # DAC code is tracked in Q16.16 fixed point: code_fp = code << 16
+    __slots__ = ("active", "start_code", "end_code", "duration", "t", "code_fp", "step_fp")
+
     def __init__(self):
         self.active = False
         self.start_code = 0
         self.end_code = 0
         self.duration = 0.0
         self.t = 0.0
+        self.code_fp = 0
+        self.step_fp = 0.0  # code_fp change per second
 
     def start(self, current_code, target_code, duration):
         self.active = True
@@ -87,22 +168,63 @@ class Ramp:
         self.end_code = int(target_code)
         self.duration = max(1e-6, float(duration))
         self.t = 0.0
+        self.code_fp = self.start_code << 16
+        self.step_fp = ((self.end_code - self.start_code) << 16) / self.duration
 
     def update(self, dt):
         if not self.active:
             return self.end_code, False
         self.t += dt
-        k = clamp(self.t / self.duration, 0.0, 1.0)
-        code = int(round(self.start_code + (self.end_code - self.start_code) * k))
-        done = (k >= 1.0)
-        if done:
+        if self.t >= self.duration:
             self.active = False
-        return code, done
+            self.code_fp = self.end_code << 16
+            return self.end_code, True
+        self.code_fp += int(self.step_fp * dt)
+        return (self.code_fp + 0x8000) >> 16, False
+
+# -------------------- Graph history --------------------
+class History:
+    # Fixed-size ring buffer of (t, u) samples; t never decreases.
+    __slots__ = ("capacity", "t", "u", "head", "n")
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.t = array("d", bytes(8 * capacity))
+        self.u = array("d", bytes(8 * capacity))
+        self.head = 0  # next write position
+        self.n = 0
+
+    def append(self, t, u):
+        self.t[self.head] = t
+        self.u[self.head] = u
+        self.head = (self.head + 1) % self.capacity
+        if self.n < self.capacity:
+            self.n += 1
+
+    def since(self, t0):
+        # (t, u) samples with t >= t0, oldest first
+        if self.n < self.capacity:
+            segments = ((0, self.n),)
+        else:
+            segments = ((self.head, self.capacity), (0, self.head))
+        for lo, hi in segments:
+            lo = bisect_left(self.t, t0, lo, hi)
+            yield from zip(self.t[lo:hi], self.u[lo:hi])
 
 # -------------------- Main system --------------------
 class GateSystem:
+    __slots__ = ("_log_cb", "dirty", "_last_view",
+                 "state", "direction", "position",
+                 "uz1", "uz2", "stress_q", "ko", "kz",
+                 "kv_o1", "kv_o2", "kv_z1", "kv_z2", "slow_mode_30",
+                 "dac_code", "target_code", "ramp", "sample_timer",
+                 "zp_adc_pulse", "zp_dac_pulse", "gt_flag", "_port300_flags",
+                 "_adc_now", "_stress_u")
+
     def __init__(self, log_cb):
-        self.log = log_cb
+        self._log_cb = log_cb
+        self.dirty = True        # something on screen changed since last redraw
+        self._last_view = None
 
         self.state = "IDLE"       # IDLE / OPENING / CLOSING / STOPPED
         self.direction = 0        # +1 open, -1 close, 0 none
@@ -110,7 +232,7 @@ class GateSystem:
 
         self.uz1 = False
         self.uz2 = False
-        self.stress = 0.0
+        self.stress_q = 0         # tenths of kgf/mm^2
 
         self.ko = False
         self.kz = False
@@ -128,21 +250,48 @@ class GateSystem:
         self.ramp = Ramp()
 
         self.sample_timer = 0.0
+        # last sampled ADC code and sensor voltage (refreshed every control_step)
+        self._adc_now = 0
+        self._stress_u = 0.0
 
         # pulses for port display (one-sample tick)
         self.zp_adc_pulse = False
         self.zp_dac_pulse = False
         self.gt_flag = True  # in model we consider ADC ready after sampling
 
+        # bits 15..8 of port 300h, kept in sync with the flags above
+        self._port300_flags = 0
+        self._sync_port300()
+
+    @property
+    def stress(self):
+        return self.stress_q / STRESS_Q
+
+    def log(self, msg):
+        self._log_cb(msg)
+        self.dirty = True
+
     def reset_sensors(self):
         self.uz1 = False
         self.uz2 = False
-        self.stress = 0.0
+        self.stress_q = 0
+        self._set_bit(P300_US, False)
         self.log("Сброс датчиков: УЗ1=0 УЗ2=0 усилие=0")
 
+    def toggle_uz(self, n):
+        if n == 1:
+            self.uz1 = not self.uz1
+            self.log(f"УЗ1 = {fmt_bool(self.uz1)}")
+        else:
+            self.uz2 = not self.uz2
+            self.log(f"УЗ2 = {fmt_bool(self.uz2)}")
+        self._set_bit(P300_US, self.uz1 or self.uz2)
+
     def press_open(self):
         self.ko = True
         self.kz = False
+        self._set_bit(P300_KO, True)
+        self._set_bit(P300_KZ, False)
         if self.state in ("IDLE", "STOPPED"):
             self.state = "OPENING"
             self.direction = +1
@@ -153,6 +302,8 @@ class GateSystem:
     def press_close(self):
         self.kz = True
         self.ko = False
+        self._set_bit(P300_KZ, True)
+        self._set_bit(P300_KO, False)
         if self.state in ("IDLE", "STOPPED"):
             self.state = "CLOSING"
             self.direction = -1
@@ -178,32 +329,42 @@ class GateSystem:
 
     def update_limits_from_position(self):
         # limits computed from position
-        self.kv_o1 = (self.position >= OPEN1_POS)
-        self.kv_o2 = (self.position >= OPEN2_POS)
-
-        self.kv_z1 = (self.position <= CLOSE1_POS)
-        self.kv_z2 = (self.position <= CLOSE2_POS)
+        kv = (
+            self.position >= OPEN1_POS,
+            self.position >= OPEN2_POS,
+            self.position <= CLOSE1_POS,
+            self.position <= CLOSE2_POS,
+        )
+        if kv != (self.kv_o1, self.kv_o2, self.kv_z1, self.kv_z2):
+            self.kv_o1, self.kv_o2, self.kv_z1, self.kv_z2 = kv
+            self._set_bit(P300_KV_O1, kv[0])
+            self._set_bit(P300_KV_O2, kv[1])
+            self._set_bit(P300_KV_Z1, kv[2])
+            self._set_bit(P300_KV_Z2, kv[3])
+
+    def _set_bit(self, mask, value):
+        # keep port 300h in step with a flag; call after changing kv_*, uz*, ko, kz or gt_flag
+        self._port300_flags = (self._port300_flags & ~mask) | (mask if value else 0)
+
+    def _sync_port300(self):
+        # full rebuild of bits 15..8 from the flags
+        us_or = self.uz1 or self.uz2
+        self._port300_flags = (
+            (self.kv_o1 << 8) | (self.kv_o2 << 9) | (self.kv_z1 << 10) | (self.kv_z2 << 11)
+            | (us_or << 12) | (self.ko << 13) | (self.kz << 14) | (self.gt_flag << 15)
+        )
 
     def build_port300(self, adc_code):
-        us_or = self.uz1 or self.uz2
-        v = 0
-        v |= (adc_code & 0xFF)
-        v |= (1 if self.kv_o1 else 0) << 8
-        v |= (1 if self.kv_o2 else 0) << 9
-        v |= (1 if self.kv_z1 else 0) << 10
-        v |= (1 if self.kv_z2 else 0) << 11
-        v |= (1 if us_or else 0) << 12
-        v |= (1 if self.ko else 0) << 13
-        v |= (1 if self.kz else 0) << 14
-        v |= (1 if self.gt_flag else 0) << 15
-        return v
+        return self._port300_flags | (adc_code & 0xFF)
+
+    def release_buttons(self):
+        if self.ko or self.kz:
+            self.ko = False
+            self.kz = False
+            self._set_bit(P300_KO | P300_KZ, False)
 
     def build_port301(self):
-        v = 0
-        v |= (self.dac_code & 0xFF)
-        v |= (1 if self.zp_dac_pulse else 0) << 14
-        v |= (1 if self.zp_adc_pulse else 0) << 15
-        return v
+        return (self.dac_code & 0xFF) | (self.zp_dac_pulse << 14) | (self.zp_adc_pulse << 15)
 
     def emergency_stop(self, reason):
         if self.state != "STOPPED":
@@ -222,10 +383,11 @@ class GateSystem:
     def control_step(self):
         # This step mimics "poll + analysis + output"
         self.zp_adc_pulse = True
-        self.gt_flag = True
+        if not self.gt_flag:
+            self.gt_flag = True
+            self._set_bit(P300_GT, True)
 
-        stress_u = tenso_to_voltage(self.stress)
-        adc_code = adc_code_from_voltage(stress_u)
+        adc_code = adc_code_from_stress_q(self.stress_q)
 
         us_or = self.uz1 or self.uz2
 
@@ -237,12 +399,12 @@ class GateSystem:
                 return adc_code
 
             # авария №3: 95% предела упругости
-            if self.stress >= TH_95:
+            if self.stress_q >= TH_95_Q:
                 self.emergency_stop("Тензо ≥ 95 кгс/мм²")
                 return adc_code
 
             # авария №2: предел пропорциональности
-            if self.stress >= TH_70:
+            if self.stress_q >= TH_70_Q:
                 if not self.slow_mode_30:
                     self.slow_mode_30 = True
                     self.log("Тензо ≥ 70 → замедление до 30% по рис.Б.8б (5с)")
@@ -251,7 +413,7 @@ class GateSystem:
                 return adc_code
 
             # выход из аварии №2 (обратимо)
-            if self.slow_mode_30 and self.stress < TH_55:
+            if self.slow_mode_30 and self.stress_q < TH_55_Q:
                 self.slow_mode_30 = False
                 nominal = self.nominal_target_code()
                 self.log("Тензо < 55 → восстановить номинальную скорость по рис.Б.8а (12с)")
@@ -297,81 +459,173 @@ class GateSystem:
         u_out = dac_voltage_from_code(self.dac_code)
         if self.state in ("OPENING", "CLOSING") and self.direction != 0:
             # speed proportional to u_out / 116V
-            frac = 0.0 if U_NOM <= 1e-6 else (u_out / U_NOM)
-            frac = clamp(frac, 0.0, 1.2)
-            v = BASE_SPEED * frac
-            self.position += self.direction * v * dt
-            self.position = clamp(self.position, 0.0, 1.0)
-
-        # Update limit switches from position
-        self.update_limits_from_position()
+            v = u_out * _POS_SPEED_PER_VOLT
+            if v > _POS_SPEED_CAP:
+                v = _POS_SPEED_CAP
+            pos = clamp(self.position + self.direction * v * dt, 0.0, 1.0)
+            if pos != self.position:
+                self.position = pos
+                # limit switches only change when the gate moves
+                self.update_limits_from_position()
 
         # Sampling / decision step each 0.25s
         self.sample_timer += dt
-        adc_code = 0
         while self.sample_timer >= SAMPLE_PERIOD:
             self.sample_timer -= SAMPLE_PERIOD
-            adc_code = self.control_step()
+            self._adc_now = self.control_step()
+            self._stress_u = tenso_voltage_from_stress_q(self.stress_q)
 
         # If stopped by normal completion and ramp ended at 0 -> go IDLE
         if self.state != "STOPPED":
             if self.direction == 0 and self.target_code == 0 and not self.ramp.active:
                 self.state = "IDLE"
-                self.ko = False
-                self.kz = False
+                self.release_buttons()
 
         # If STOPPED and voltage already 0 -> just wait for operator (O/C)
         if self.state == "STOPPED" and self.target_code == 0 and not self.ramp.active:
-            self.ko = False
-            self.kz = False
+            self.release_buttons()
 
-        # Build ports for UI
-        stress_u = tenso_to_voltage(self.stress)
-        adc_code_now = adc_code_from_voltage(stress_u)
+        # Build ports for UI; the ADC byte is the one latched at the last sample
+        adc_code_now = self._adc_now
         port300 = self.build_port300(adc_code_now)
         port301 = self.build_port301()
-        return port300, port301, adc_code_now, u_out, stress_u, (self.uz1 or self.uz2)
+
+        # everything the UI shows is derived from these
+        view = (self.state, self.position, self.stress_q, self.dac_code, self.target_code,
+                self.slow_mode_30, port300, port301)
+        if view != self._last_view:
+            self._last_view = view
+            self.dirty = True
+        return port300, port301, adc_code_now, u_out, self._stress_u, (self.uz1 or self.uz2)
 
 # -------------------- Drawing --------------------
 def draw_rect(surf, rect, color, w=1):
     pygame.draw.rect(surf, color, rect, w)
 
+@lru_cache(maxsize=2048)
+def render_text(font, text, color):
+    # Most labels are identical from frame to frame; rasterize each one once,
+    # already in the display's pixel format so the blit needs no conversion.
+    return font.render(text, True, color).convert_alpha()
+
 def draw_text(surf, font, x, y, text, color=(230,230,230)):
-    img = font.render(text, True, color)
+    img = render_text(font, text, color)
     surf.blit(img, (x, y))
     return img.get_height()
 
+_bar_scratch = pygame.Rect(0, 0, 0, 0)  # reused for the filled part of every bar
+
 def draw_bar(surf, rect, value01, label, color=(80,200,120), back=(50,50,50)):
     pygame.draw.rect(surf, back, rect, 0)
-    w = int(rect.width * clamp(value01, 0.0, 1.0))
-    pygame.draw.rect(surf, color, pygame.Rect(rect.x, rect.y, w, rect.height), 0)
+    _bar_scratch.update(rect.x, rect.y, int(rect.width * clamp(value01, 0.0, 1.0)), rect.height)
+    pygame.draw.rect(surf, color, _bar_scratch, 0)
     pygame.draw.rect(surf, (120,120,120), rect, 1)
     # label
     return
 
-def draw_graph(surf, rect, series, t_now, seconds=60.0):
-    # axes
-    pygame.draw.rect(surf, (60,60,60), rect, 1)
-    # grid
+def make_graph_background(size):
+    # Axes, grid and 116/58/34.8V reference lines never change: draw them once.
+    # One extra row/column holds the line ends that stick out past the frame.
+    w, h = size
+    bg = pygame.Surface((w + 1, h + 1)).convert()
+    bg.fill(BG_COLOR)
+    pygame.draw.rect(bg, (60,60,60), pygame.Rect(0, 0, w, h), 1)
     for i in range(1, 5):
-        y = rect.y + int(rect.height * i / 5)
-        pygame.draw.line(surf, (35,35,35), (rect.x, y), (rect.x + rect.width, y), 1)
+        y = int(h * i / 5)
+        pygame.draw.line(bg, (35,35,35), (0, y), (w, y), 1)
     for i in range(1, 6):
-        x = rect.x + int(rect.width * i / 6)
-        pygame.draw.line(surf, (35,35,35), (x, rect.y), (x, rect.y + rect.height), 1)
+        x = int(w * i / 6)
+        pygame.draw.line(bg, (35,35,35), (x, 0), (x, h), 1)
+    for u in (U_NOM, U_HALF, U_SLOW):
+        yline = h - int(clamp(u / DAC_VMAX, 0.0, 1.0) * h)
+        pygame.draw.line(bg, (60,60,60), (0, yline), (w, yline), 1)
+    return bg
+
+def draw_graph(surf, rect, bg, series, t_now, seconds=60.0):
+    surf.blit(bg, rect.topleft)
 
     # plot last "seconds"
     t0 = t_now - seconds
+    x0, y0, w, h = rect.x, rect.bottom, rect.width, rect.height
+    ky = h / DAC_VMAX
     pts = []
-    for (t, u) in series:
-        if t < t0:
-            continue
-        x = rect.x + int((t - t0) / seconds * rect.width)
-        y = rect.y + rect.height - int(clamp(u / DAC_VMAX, 0.0, 1.0) * rect.height)
-        pts.append((x, y))
+    append = pts.append
+    # u is a DAC output voltage, so it is never below 0; only the top needs a cap
+    for t, u in series.since(t0):
+        append((x0 + int((t - t0) / seconds * w), y0 - int((u if u < DAC_VMAX else DAC_VMAX) * ky)))
     if len(pts) >= 2:
         pygame.draw.lines(surf, (120,220,255), False, pts, 2)
 
+def make_static_layer(font, font_small, font_big, graph):
+    # Everything that never changes: background, panel frames, titles, legends, rules.
+    # Drawn once; each redraw starts from a copy of it instead of an empty screen.
+    surf = pygame.Surface((W, H)).convert()
+    surf.fill(BG_COLOR)
+
+    # panels
+    draw_rect(surf, pygame.Rect(20, 20, 520, 860), (70,70,70), 1)
+    draw_rect(surf, pygame.Rect(560, 20, 720, 860), (70,70,70), 1)
+    draw_rect(surf, pygame.Rect(1300, 20, 280, 860), (70,70,70), 1)
+
+    # Title
+    draw_text(surf, font_big, 30, 30, "УПРАВЛЕНИЕ ВОРОТАМИ — ВАРИАНТ 30", (200,230,255))
+
+    # -------- Left panel --------
+    rows = LEFT_ROWS
+    draw_text(surf, font, 40, rows["heading"], "ДАТЧИКИ / СИГНАЛЫ (порт 300h)", (180,220,180))
+    draw_text(surf, font_small, 40, rows["stress_hint"], "↑/↓ — изменить усилие", (160,160,160))
+    draw_text(surf, font, 40, rows["port300_bits"], "Биты: 15 GT | 14 KZ | 13 KO | 12 US | 11 З2 | 10 З1 | 9 О2 | 8 О1 | 7..0 АЦП", (140,140,140))
+    draw_text(surf, font, 40, rows["port301_bits"], "Биты: 15 ZP_АЦП | 14 ZP_ЦАП | 7..0 Данные ЦАП", (140,140,140))
+
+    # -------- Mid panel --------
+    draw_text(surf, font, 580, 40, "ИСТОРИЯ НАПРЯЖЕНИЯ НА ЭЛЕКТРОПРИВОДЕ (0..120В)", (200,230,255))
+    # Label reference lines (116, 58, 34.8); the lines are part of the graph background
+    for u, label in [(U_NOM, "116В"), (U_HALF, "58В"), (U_SLOW, "34.8В")]:
+        yline = graph.y + graph.height - int(clamp(u / DAC_VMAX, 0.0, 1.0) * graph.height)
+        draw_text(surf, font_small, graph.x + graph.width + 10, yline - 8, label, (140,140,140))
+    draw_text(surf, font, 580, 470, "ЖУРНАЛ СОБЫТИЙ (последние строки, без скролла)", (200,230,255))
+
+    # -------- Right panel --------
+    draw_text(surf, font, 1320, 40, "ТЕКУЩИЙ РЕЖИМ", (200,230,255))
+    mode_box = pygame.Rect(1320, 80, 240, 120)
+    pygame.draw.rect(surf, (28,28,32), mode_box, 0)
+    pygame.draw.rect(surf, (80,80,80), mode_box, 1)
+    draw_text(surf, font, 1320, 230, "ЦЕЛЕВОЙ УРОВЕНЬ", (200,230,255))
+
+    draw_text(surf, font, 1320, 340, "ПРАВИЛА (кратко)", (200,230,255))
+    rules = [
+        "O/C: старт, разгон 12с",
+        "КВ1: до 50% за 5с",
+        "КВ2: до 0 за 5с",
+        "УЗ или тензо>=95: стоп",
+        "тензо>=70: до 30% (5с)",
+        "тензо<55: возврат (12с)"
+    ]
+    yy = 370
+    for r in rules:
+        draw_text(surf, font_small, 1320, yy, "- " + r, (190,190,190))
+        yy += 22
+
+    draw_text(surf, font_small, 1320, 850, "O/C/1/2/↑/↓/R, Esc", (140,140,140))
+    return surf
+
+def render_log_line(font, line):
+    # Log entries never change, so each is rasterized once when it is added.
+    # It bypasses render_text: every entry is unique and would only churn that cache.
+    return font.render(line, True, (220,220,220)).convert_alpha()
+
+def render_log(size, lines):
+    # The log only changes when a line is added; compose the whole box at once
+    # from the already rendered lines.
+    surf = pygame.Surface(size).convert()
+    surf.fill((30,30,34))
+    pygame.draw.rect(surf, (60,60,60), surf.get_rect(), 1)
+    yy = 10
+    for img in lines:
+        surf.blit(img, (10, yy))
+        yy += 24
+    return surf
+
 # -------------------- Main --------------------
 def main():
     pygame.init()
@@ -379,141 +633,180 @@ def main():
     pygame.display.set_caption("Имитационная модель СРВ: автоматические ворота (вариант 30)")
     clock = pygame.time.Clock()
 
+    # per-frame calls bound once
+    get_ticks = pygame.time.get_ticks
+    events_get = pygame.event.get
+    keys_get = pygame.key.get_pressed
+    tick = clock.tick
+
     font = pygame.font.SysFont("consolas", 18)
     font_small = pygame.font.SysFont("consolas", 16)
     font_big = pygame.font.SysFont("consolas", 28)
 
-    log_lines = deque(maxlen=MAX_LOG_LINES)
+    # Ring of the latest rendered lines, newest at log_head+1.
+    log_lines = [None] * MAX_LOG_LINES
+    log_head = 0
+    log_n = 0
+    log_surf = None
 
     def log(msg):
-        t = pygame.time.get_ticks() / 1000.0
+        nonlocal log_head, log_n, log_surf
+        log_surf = None
+        t = get_ticks() / 1000.0
         mm = int(t // 60)
         ss = int(t % 60)
-        log_lines.appendleft(f"[{mm:02d}:{ss:02d}] {msg}")
+        log_lines[log_head] = render_log_line(font_small, f"[{mm:02d}:{ss:02d}] {msg}")
+        log_head = (log_head - 1) % MAX_LOG_LINES
+        if log_n < MAX_LOG_LINES:
+            log_n += 1
 
     sysm = GateSystem(log)
     log("Готово. O=открыть, C=закрыть, 1/2=УЗ, ↑/↓=усилие, R=сброс")
 
-    history = deque(maxlen=5000)
+    history = History(HISTORY_LEN)
+    graph = pygame.Rect(580, 80, 680, 360)
+    graph_bg = make_graph_background(graph.size)
+    static_layer = make_static_layer(font, font_small, font_big, graph)
+    graph_u = None
+    graph_busy_until = 0.0
+
+    # screen zones pushed to the display when their content changes
+    left_zone = pygame.Rect(0, 0, 550, H)
+    right_zone = pygame.Rect(1290, 0, W - 1290, H)
+    graph_zone = graph.inflate(6, 6)
+    log_rect = pygame.Rect(580, 500, 680, 360)
+    stress_bar = pygame.Rect(40, LEFT_ROWS["stress_bar"], 460, 18)
+    pos_bar = pygame.Rect(40, LEFT_ROWS["pos_bar"], 460, 18)
+    left_view = right_view = None
+    full_update = True   # first frame and expose events push the whole screen
+    render_ms = RENDER_PERIOD_MS  # time since the last redraw; draw the first frame at once
+    # ZP strobes last one simulation step, which a rate-limited redraw would
+    # almost always miss; collect them here until the next redraw shows them
+    zp_shown = 0
+
+    # only these keys are polled as held state; the rest come as KEYDOWN events
+    K_UP, K_DOWN = pygame.K_UP, pygame.K_DOWN
+    stress_rem = 0  # part of a stress step (in 1/1000) carried to the next frame
+
+    # KEYDOWN handlers; Esc is handled in the loop since it ends it
+    key_actions = {
+        pygame.K_o: sysm.press_open,
+        pygame.K_c: sysm.press_close,
+        pygame.K_1: lambda: sysm.toggle_uz(1),
+        pygame.K_2: lambda: sysm.toggle_uz(2),
+        pygame.K_r: sysm.reset_sensors,
+    }
+    QUIT, KEYDOWN, VIDEOEXPOSE, K_ESCAPE = pygame.QUIT, pygame.KEYDOWN, pygame.VIDEOEXPOSE, pygame.K_ESCAPE
+    # mouse, key-up and text input are never read; keep them out of the queue
+    pygame.event.set_blocked([pygame.MOUSEMOTION, pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP,
+                              pygame.MOUSEWHEEL, pygame.KEYUP, pygame.TEXTINPUT, pygame.TEXTEDITING])
 
     running = True
     while running:
-        dt = clock.tick(60) / 1000.0
-        t_now = pygame.time.get_ticks() / 1000.0
-
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_ESCAPE:
+        dt_ms = tick(SIM_FPS)
+        dt = dt_ms / 1000.0
+        t_now = get_ticks() / 1000.0
+
+        for event in events_get():
+            etype = event.type
+            if etype == KEYDOWN:
+                sysm.dirty = True
+                if event.key == K_ESCAPE:
                     running = False
-
-                if event.key == pygame.K_o:
-                    sysm.press_open()
-                if event.key == pygame.K_c:
-                    sysm.press_close()
-
-                if event.key == pygame.K_1:
-                    sysm.uz1 = not sysm.uz1
-                    log(f"УЗ1 = {fmt_bool(sysm.uz1)}")
-                if event.key == pygame.K_2:
-                    sysm.uz2 = not sysm.uz2
-                    log(f"УЗ2 = {fmt_bool(sysm.uz2)}")
-
-                if event.key == pygame.K_r:
-                    sysm.reset_sensors()
-
-        keys = pygame.key.get_pressed()
-        if keys[pygame.K_UP]:
-            sysm.stress = clamp(sysm.stress + 25.0 * dt, 0.0, TENSO_MAX)
-        if keys[pygame.K_DOWN]:
-            sysm.stress = clamp(sysm.stress - 25.0 * dt, 0.0, TENSO_MAX)
+                else:
+                    action = key_actions.get(event.key)
+                    if action is not None:
+                        action()
+            elif etype == QUIT:
+                running = False
+            elif etype == VIDEOEXPOSE:
+                sysm.dirty = True
+                full_update = True
+
+        keys = keys_get()
+        up, down = keys[K_UP], keys[K_DOWN]
+        if up or down:
+            step, stress_rem = divmod(stress_rem + dt_ms * STRESS_RATE_Q, 1000)
+            if up:
+                sysm.stress_q = clamp(sysm.stress_q + step, 0, TENSO_MAX_Q)
+            if down:
+                sysm.stress_q = clamp(sysm.stress_q - step, 0, TENSO_MAX_Q)
 
         port300, port301, adc_code, u_out, stress_u, us_or = sysm.update(dt)
+        zp_shown |= port301 & (P301_ZP_DAC | P301_ZP_ADC)
 
         # history for graph
-        history.append((t_now, u_out))
+        history.append(t_now, u_out)
+
+        # the graph keeps scrolling until the last voltage change leaves its window
+        if u_out != graph_u:
+            graph_u = u_out
+            graph_busy_until = t_now + GRAPH_SECONDS
+        if t_now <= graph_busy_until:
+            sysm.dirty = True
+
+        # redraw when something changed, but not more often than RENDER_PERIOD_MS;
+        # a change seen between redraws stays pending until the next one
+        render_ms += dt_ms
+        if not sysm.dirty or render_ms < RENDER_PERIOD_MS:
+            continue
+        sysm.dirty = False
+        render_ms = 0
+        port301 |= zp_shown
+        zp_shown = 0
+
+        dirty_rects = []
+        view = (sysm.uz1, sysm.uz2, sysm.stress_q, stress_u, port300, port301, sysm.position)
+        if view != left_view:
+            left_view = view
+            dirty_rects.append(left_zone)
+        if t_now <= graph_busy_until:
+            dirty_rects.append(graph_zone)
+        if log_surf is None:
+            dirty_rects.append(log_rect)
+        view = (sysm.state, sysm.slow_mode_30, sysm.target_code)
+        if view != right_view:
+            right_view = view
+            dirty_rects.append(right_zone)
 
         # -------------------- Layout --------------------
-        screen.fill((18, 18, 22))
-
-        # panels
-        left = pygame.Rect(20, 20, 520, 860)
-        mid = pygame.Rect(560, 20, 720, 860)
-        right = pygame.Rect(1300, 20, 280, 860)
-
-        draw_rect(screen, left, (70,70,70), 1)
-        draw_rect(screen, mid, (70,70,70), 1)
-        draw_rect(screen, right, (70,70,70), 1)
-
-        # Title
-        draw_text(screen, font_big, 30, 30, "УПРАВЛЕНИЕ ВОРОТАМИ — ВАРИАНТ 30", (200,230,255))
+        # frames, titles and legends come from the static layer
+        screen.blit(static_layer, (0, 0))
 
         # -------- Left panel: sensors / ports --------
-        y = 80
-        draw_text(screen, font, 40, y, "ДАТЧИКИ / СИГНАЛЫ (порт 300h)", (180,220,180)); y += 30
+        rows = LEFT_ROWS
+        draw_text(screen, font, 40, rows["ko"], f"KO (кнопка ОТКР): {fmt_bool(sysm.ko)}   (O)", (220,220,220))
+        draw_text(screen, font, 40, rows["kz"], f"KZ (кнопка ЗАКР): {fmt_bool(sysm.kz)}   (C)", (220,220,220))
+        draw_text(screen, font, 40, rows["uz"], f"УЗ1: {fmt_bool(sysm.uz1)} (1)   УЗ2: {fmt_bool(sysm.uz2)} (2)   US(OR): {fmt_bool(us_or)}", (220,180,180))
 
-        draw_text(screen, font, 40, y, f"KO (кнопка ОТКР): {fmt_bool(sysm.ko)}   (O)", (220,220,220)); y += 24
-        draw_text(screen, font, 40, y, f"KZ (кнопка ЗАКР): {fmt_bool(sysm.kz)}   (C)", (220,220,220)); y += 24
-        y += 6
-        draw_text(screen, font, 40, y, f"УЗ1: {fmt_bool(sysm.uz1)} (1)   УЗ2: {fmt_bool(sysm.uz2)} (2)   US(OR): {fmt_bool(us_or)}", (220,180,180)); y += 24
-        y += 6
+        draw_text(screen, font, 40, rows["kv_o"], f"КВ_О1: {fmt_bool(sysm.kv_o1)}   КВ_О2: {fmt_bool(sysm.kv_o2)}", (220,220,220))
+        draw_text(screen, font, 40, rows["kv_z"], f"КВ_З1: {fmt_bool(sysm.kv_z1)}   КВ_З2: {fmt_bool(sysm.kv_z2)}", (220,220,220))
 
-        draw_text(screen, font, 40, y, f"КВ_О1: {fmt_bool(sysm.kv_o1)}   КВ_О2: {fmt_bool(sysm.kv_o2)}", (220,220,220)); y += 24
-        draw_text(screen, font, 40, y, f"КВ_З1: {fmt_bool(sysm.kv_z1)}   КВ_З2: {fmt_bool(sysm.kv_z2)}", (220,220,220)); y += 24
-        y += 10
-
-        draw_text(screen, font, 40, y, f"Тензо: {sysm.stress:6.1f} кгс/мм²   Uдатч={stress_u:5.2f}В   АЦП={adc_code:3d} (0x{adc_code:02X})", (220,220,220)); y += 24
+        draw_text(screen, font, 40, rows["stress"], f"Тензо: {sysm.stress:6.1f} кгс/мм²   Uдатч={stress_u:5.2f}В   АЦП={adc_code:3d} ({_HEX8[adc_code]})", (220,220,220))
 
         # Stress bar
-        bar = pygame.Rect(40, y+10, 460, 18)
-        draw_bar(screen, bar, sysm.stress / TENSO_MAX, "stress")
-        draw_text(screen, font_small, 40, y+32, "↑/↓ — изменить усилие", (160,160,160))
-        y += 70
-
-        draw_text(screen, font, 40, y, f"Порт 300h (вход):  0x{port300:04X}", (180,200,255)); y += 26
-        draw_text(screen, font, 40, y, "Биты: 15 GT | 14 KZ | 13 KO | 12 US | 11 З2 | 10 З1 | 9 О2 | 8 О1 | 7..0 АЦП", (140,140,140)); y += 40
+        draw_bar(screen, stress_bar, sysm.stress_q / TENSO_MAX_Q, "stress")
 
-        draw_text(screen, font, 40, y, f"Порт 301h (выход): 0x{port301:04X}", (180,200,255)); y += 26
-        draw_text(screen, font, 40, y, "Биты: 15 ZP_АЦП | 14 ZP_ЦАП | 7..0 Данные ЦАП", (140,140,140)); y += 40
+        # each port value is followed by its bit legend from the static layer
+        draw_text(screen, font, 40, rows["port300"], f"Порт 300h (вход):  0x{port300:04X}", (180,200,255))
+        draw_text(screen, font, 40, rows["port301"], f"Порт 301h (выход): 0x{port301:04X}", (180,200,255))
 
-        draw_text(screen, font, 40, y, f"ЦАП код: {sysm.dac_code:3d} (0x{sysm.dac_code:02X})  -> Uвых={u_out:6.1f} В", (220,220,220)); y += 24
+        draw_text(screen, font, 40, rows["dac"], f"ЦАП код: {sysm.dac_code:3d} ({_HEX8[sysm.dac_code]})  -> Uвых={u_out:6.1f} В", (220,220,220))
 
         # Position bar
-        draw_text(screen, font, 40, y+20, f"Положение створок: {sysm.position*100:5.1f}%", (220,220,220))
-        bar2 = pygame.Rect(40, y+50, 460, 18)
-        draw_bar(screen, bar2, sysm.position, "pos", color=(200,180,80))
-        y += 90
+        draw_text(screen, font, 40, rows["position"], f"Положение створок: {sysm.position*100:5.1f}%", (220,220,220))
+        draw_bar(screen, pos_bar, sysm.position, "pos", color=(200,180,80))
 
         # -------- Mid panel: graph + log --------
-        draw_text(screen, font, 580, 40, "ИСТОРИЯ НАПРЯЖЕНИЯ НА ЭЛЕКТРОПРИВОДЕ (0..120В)", (200,230,255))
-        graph = pygame.Rect(580, 80, 680, 360)
-        draw_graph(screen, graph, history, t_now, seconds=60.0)
-
-        # Mark reference lines (116, 58, 34.8)
-        for u, label in [(U_NOM, "116В"), (U_HALF, "58В"), (U_SLOW, "34.8В")]:
-            yline = graph.y + graph.height - int(clamp(u / DAC_VMAX, 0.0, 1.0) * graph.height)
-            pygame.draw.line(screen, (60,60,60), (graph.x, yline), (graph.x + graph.width, yline), 1)
-            draw_text(screen, font_small, graph.x + graph.width + 10, yline - 8, label, (140,140,140))
+        draw_graph(screen, graph, graph_bg, history, t_now, seconds=GRAPH_SECONDS)
 
         # Event log area
-        draw_text(screen, font, 580, 470, "ЖУРНАЛ СОБЫТИЙ (последние строки, без скролла)", (200,230,255))
-        log_rect = pygame.Rect(580, 500, 680, 360)
-        pygame.draw.rect(screen, (30,30,34), log_rect, 0)
-        pygame.draw.rect(screen, (60,60,60), log_rect, 1)
-
-        yy = log_rect.y + 10
-        for line in list(log_lines):
-            draw_text(screen, font_small, log_rect.x + 10, yy, line, (220,220,220))
-            yy += 24
+        if log_surf is None:
+            log_surf = render_log(log_rect.size,
+                                  (log_lines[(log_head + 1 + i) % MAX_LOG_LINES] for i in range(log_n)))
+        screen.blit(log_surf, log_rect.topleft)
 
         # -------- Right panel: current mode --------
-        draw_text(screen, font, 1320, 40, "ТЕКУЩИЙ РЕЖИМ", (200,230,255))
-        mode_box = pygame.Rect(1320, 80, 240, 120)
-        pygame.draw.rect(screen, (28,28,32), mode_box, 0)
-        pygame.draw.rect(screen, (80,80,80), mode_box, 1)
-
         mode_color = (120,220,255)
         if sysm.state == "STOPPED":
             mode_color = (255,110,110)
@@ -526,28 +819,15 @@ def main():
         draw_text(screen, font_small, 1340, 150, f"slow30: {fmt_bool(sysm.slow_mode_30)}", (220,220,220))
 
         # Show what the controller tries to do
-        draw_text(screen, font, 1320, 230, "ЦЕЛЕВОЙ УРОВЕНЬ", (200,230,255))
         target_u = dac_voltage_from_code(sysm.target_code)
-        draw_text(screen, font, 1320, 260, f"target: {sysm.target_code:3d} (0x{sysm.target_code:02X})", (220,220,220))
+        draw_text(screen, font, 1320, 260, f"target: {sysm.target_code:3d} ({_HEX8[sysm.target_code]})", (220,220,220))
         draw_text(screen, font, 1320, 286, f"Utarget: {target_u:6.1f} В", (220,220,220))
 
-        draw_text(screen, font, 1320, 340, "ПРАВИЛА (кратко)", (200,230,255))
-        rules = [
-            "O/C: старт, разгон 12с",
-            "КВ1: до 50% за 5с",
-            "КВ2: до 0 за 5с",
-            "УЗ или тензо>=95: стоп",
-            "тензо>=70: до 30% (5с)",
-            "тензо<55: возврат (12с)"
-        ]
-        yy = 370
-        for r in rules:
-            draw_text(screen, font_small, 1320, yy, "- " + r, (190,190,190))
-            yy += 22
-
-        draw_text(screen, font_small, 1320, 850, "O/C/1/2/↑/↓/R, Esc", (140,140,140))
-
-        pygame.display.flip()
+        if full_update:
+            full_update = False
+            pygame.display.flip()
+        else:
+            pygame.display.update(dirty_rects)
 
     pygame.quit()
     sys.exit()